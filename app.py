@@ -1,13 +1,20 @@
 
 
-import io
 import os
+import random
 import re
 import time
+import hashlib
 import json
+import logging
+import mimetypes
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime, timedelta
-from typing import List, Tuple
+from typing import IO, Dict, List, Optional, Tuple
 
+import httplib2
+import numpy as np
 import pandas as pd
 import pytz
 import streamlit as st
@@ -16,11 +23,14 @@ import streamlit as st
 from google.oauth2.service_account import Credentials as SA
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaIoBaseUpload
 
 # Drive as YOU (OAuth)
 from pydrive2.auth import GoogleAuth
 from pydrive2.drive import GoogleDrive
 
+logger = logging.getLogger(__name__)
+
 # =====================
 # ---- CONFIG ---------
 # =====================
@@ -29,6 +39,8 @@ SHEET_ID = st.secrets.get("SHEET_ID", "")
 DRIVE_FOLDER_ID = st.secrets.get("DRIVE_FOLDER_ID", "")
 
 WORKSHEET = "Entries"
+DISK_CACHE_DIR = ".cache"  # Feather snapshots of the entries, keyed by sheet modifiedTime
+UPLOADS_WORKSHEET = "_uploads"  # hidden tab: sha256 of each uploaded file -> Drive link
 HEADER_IMAGE = None
 
 # Optional Calendar
@@ -38,21 +50,29 @@ CALENDAR_EVENT_HOUR_LOCAL = 9
 
 ROOMMATES = ["Abhinav", "Harsha", "Gowith", "Gautam", "Dinesh", "Prudhvi", "Shanmukh"]
 CATEGORIES = ["Rent", "Utilities", "PG&E"]
+DRIVE_UPLOAD_WORKERS = 8
 HEADERS = ["timestamp", "roommate", "month", "category", "amount", "status", "date", "notes", "file_links"]
+SUMMARY_COLUMNS = ["date", "roommate", "month", "category", "amount", "status", "file_links"]
+SUMMARY_MAX_ROWS = 500
+CATEGORICAL_COLUMNS = ["roommate", "month", "category", "status"]
 
 # ==========================
 # ---- ID NORMALIZERS  -----
 # ==========================
+_SHEET_ID_RE = re.compile(r"/spreadsheets/d/([A-Za-z0-9_-]+)")
+_FOLDER_RE = re.compile(r"/folders/([A-Za-z0-9_-]+)")
+_A1_ROW_RE = re.compile(r"[A-Z]+(\d+)")
+
 def normalize_sheet_id(value: str) -> str:
     if not value:
         return value
-    m = re.search(r"/spreadsheets/d/([a-zA-Z0-9-_]+)", value)
+    m = _SHEET_ID_RE.search(value)
     return m.group(1) if m else value
 
 def normalize_drive_folder_id(value: str) -> str:
     if not value:
         return value
-    m = re.search(r"/folders/([a-zA-Z0-9-_]+)", value)
+    m = _FOLDER_RE.search(value)
     return m.group(1) if m else value
 
 SHEET_ID = normalize_sheet_id(SHEET_ID)
@@ -73,6 +93,11 @@ def _load_drive_oauth_client_from_secrets() -> dict:
 # ==========================
 # ---- GOOGLE HELPERS  -----
 # ==========================
+@st.cache_resource(show_spinner=False)
+def _sa_creds_base():
+    """Parse the service-account JSON/key once; services derive scoped copies."""
+    return SA.from_service_account_info(_load_service_account_from_secrets())
+
 @st.cache_resource(show_spinner=False)
 def get_sheets_service():
     if "google_service_account" not in st.secrets:
@@ -81,16 +106,23 @@ def get_sheets_service():
         "https://www.googleapis.com/auth/spreadsheets",
         "https://www.googleapis.com/auth/drive",
     ]
-    creds = SA.from_service_account_info(_load_service_account_from_secrets(), scopes=scopes)
-    return build("sheets", "v4", credentials=creds)
+    creds = _sa_creds_base().with_scopes(scopes)
+    return build("sheets", "v4", credentials=creds, cache_discovery=False, static_discovery=True)
 
 @st.cache_resource(show_spinner=False)
 def get_calendar_service():
     if not CALENDAR_ID or "google_service_account" not in st.secrets:
         return None
     scopes = ["https://www.googleapis.com/auth/calendar"]
-    creds = SA.from_service_account_info(_load_service_account_from_secrets(), scopes=scopes)
-    return build("calendar", "v3", credentials=creds)
+    creds = _sa_creds_base().with_scopes(scopes)
+    return build("calendar", "v3", credentials=creds, cache_discovery=False, static_discovery=True)
+
+@st.cache_resource(show_spinner=False)
+def get_sa_drive_service():
+    """Drive v3 as the service account, for cheap metadata reads on the sheet file."""
+    scopes = ["https://www.googleapis.com/auth/drive.metadata.readonly"]
+    creds = _sa_creds_base().with_scopes(scopes)
+    return build("drive", "v3", credentials=creds, cache_discovery=False, static_discovery=True)
 
 @st.cache_resource(show_spinner=False)
 def get_drive_client():
@@ -124,9 +156,30 @@ def get_drive_client():
         gauth.Authorize()
     return GoogleDrive(gauth)
 
+@st.cache_resource(show_spinner=False)
+def get_drive_service():
+    """Drive v3 client for lean field-masked calls.
+
+    Shared across sessions, so it carries no credentials of its own: every request
+    is executed with a per-thread authorized http from _thread_http(drive).
+    """
+    return build(
+        "drive", "v3", http=httplib2.Http(), cache_discovery=False, static_discovery=True
+    )
+
 # ==========================
 # ---- SHEETS UTILITIES ----
 # ==========================
+def _http_status(e: HttpError):
+    status = getattr(e, "status_code", None) or (e.resp.status if hasattr(e, "resp") else None)
+    return int(status) if status else None
+
+def _retry_after(e: HttpError) -> float:
+    try:
+        return float(e.resp.get("retry-after", 0))
+    except (AttributeError, TypeError, ValueError):
+        return 0.0
+
 def _retry_sheets(callable_fn, *args, **kwargs):
     delay = 1.0
     last_err = None
@@ -134,15 +187,26 @@ def _retry_sheets(callable_fn, *args, **kwargs):
         try:
             return callable_fn(*args, **kwargs)
         except HttpError as e:
-            status = getattr(e, "status_code", None) or (e.resp.status if hasattr(e, "resp") else None)
-            if status and 500 <= int(status) < 600:
+            status = _http_status(e)
+            if status == 429 or (status and 500 <= status < 600):
                 last_err = e
-                time.sleep(delay)
+                # Jitter so roommates saving at the same time don't retry in lockstep.
+                time.sleep(max(delay * random.uniform(0.5, 1.5), _retry_after(e)))
                 delay = min(delay * 2, 8)
                 continue
             raise
     raise last_err if last_err else RuntimeError("Unknown Sheets error")
 
+def _write_headers(svc):
+    _retry_sheets(
+        svc.spreadsheets().values().update(
+            spreadsheetId=SHEET_ID,
+            range=f"{WORKSHEET}!A1",
+            valueInputOption="USER_ENTERED",
+            body={"values": [HEADERS]},
+        ).execute
+    )
+
 def ensure_worksheet_and_headers(svc):
     if not SHEET_ID:
         raise RuntimeError("SHEET_ID is blank. Add it to Streamlit secrets.")
@@ -155,14 +219,7 @@ def ensure_worksheet_and_headers(svc):
                 body={"requests": [{"addSheet": {"properties": {"title": WORKSHEET}}}]}
             ).execute
         )
-        _retry_sheets(
-            svc.spreadsheets().values().update(
-                spreadsheetId=SHEET_ID,
-                range=f"{WORKSHEET}!A1",
-                valueInputOption="USER_ENTERED",
-                body={"values": [HEADERS]},
-            ).execute
-        )
+        _write_headers(svc)
     else:
         resp = _retry_sheets(
             svc.spreadsheets().values().get(
@@ -171,54 +228,271 @@ def ensure_worksheet_and_headers(svc):
         )
         values = resp.get("values", [])
         if not values or values[0] != HEADERS:
-            _retry_sheets(
-                svc.spreadsheets().values().update(
-                    spreadsheetId=SHEET_ID,
-                    range=f"{WORKSHEET}!A1",
-                    valueInputOption="USER_ENTERED",
-                    body={"values": [HEADERS]},
-                ).execute
-            )
+            _write_headers(svc)
 
-def append_row(svc, row: list):
-    _retry_sheets(
+def append_rows(svc, rows: List[list], sheet_range: str = f"{WORKSHEET}!A:I") -> dict:
+    """Append all rows in one values.append call instead of one call per row."""
+    if not rows:
+        return {}
+    return _retry_sheets(
         svc.spreadsheets().values().append(
             spreadsheetId=SHEET_ID,
-            range=f"{WORKSHEET}!A:I",
+            range=sheet_range,
             valueInputOption="USER_ENTERED",
             insertDataOption="INSERT_ROWS",
-            body={"values": [row]},
+            body={"values": rows},
         ).execute
     )
 
-@st.cache_data(show_spinner=False)
-def load_entries_df_cached():
-    svc = get_sheets_service()
-    ensure_worksheet_and_headers(svc)
-    resp = _retry_sheets(
-        svc.spreadsheets().values().get(
-            spreadsheetId=SHEET_ID, range=f"{WORKSHEET}!A2:I"
+def first_appended_row(append_resp: dict) -> int:
+    """Sheet row number of the first row written by append_rows ("Entries!A10:I12" -> 10)."""
+    updated = append_resp["updates"]["updatedRange"]
+    return int(_A1_ROW_RE.match(updated.rsplit("!", 1)[-1]).group(1))
+
+def set_file_links(svc, links_by_row: Dict[int, str]):
+    """Fill in the file_links cells of already-appended rows in one batchUpdate."""
+    if not links_by_row:
+        return
+    _retry_sheets(
+        svc.spreadsheets().values().batchUpdate(
+            spreadsheetId=SHEET_ID,
+            body={
+                "valueInputOption": "USER_ENTERED",
+                "data": [
+                    {"range": f"{WORKSHEET}!I{r}", "values": [[links]]}
+                    for r, links in links_by_row.items()
+                ],
+            },
         ).execute
     )
-    rows = resp.get("values", [])
-    if not rows:
-        return pd.DataFrame(columns=HEADERS)
-    df = pd.DataFrame(rows, columns=HEADERS)
-    if "amount" in df.columns:
-        df["amount"] = pd.to_numeric(df["amount"], errors="coerce").fillna(0.0)
+
+@st.cache_resource(show_spinner=False)
+def load_upload_index() -> Dict[str, str]:
+    """sha256 hex digest -> Drive link for every receipt uploaded so far."""
+    svc = get_sheets_service()
+    try:
+        resp = _retry_sheets(
+            svc.spreadsheets().values().get(
+                spreadsheetId=SHEET_ID, range=f"{UPLOADS_WORKSHEET}!A:B"
+            ).execute
+        )
+    except HttpError as e:
+        if _http_status(e) != 400:  # 400 = tab not created yet
+            raise
+        return {}
+    return {r[0]: r[1] for r in resp.get("values", []) if len(r) >= 2}
+
+def record_uploads(svc, links_by_digest: Dict[str, str]):
+    """Persist new digest -> link pairs in one append and add them to the cached index."""
+    if not links_by_digest:
+        return
+    rows = [[digest, link] for digest, link in links_by_digest.items()]
+    try:
+        append_rows(svc, rows, sheet_range=f"{UPLOADS_WORKSHEET}!A:B")
+    except HttpError as e:
+        if _http_status(e) != 400:
+            raise
+        _retry_sheets(
+            svc.spreadsheets().batchUpdate(
+                spreadsheetId=SHEET_ID,
+                body={"requests": [{"addSheet": {"properties": {"title": UPLOADS_WORKSHEET, "hidden": True}}}]}
+            ).execute
+        )
+        append_rows(svc, rows, sheet_range=f"{UPLOADS_WORKSHEET}!A:B")
+    load_upload_index().update(links_by_digest)
+
+def _sheet_modified_time() -> Optional[str]:
+    try:
+        meta = get_sa_drive_service().files().get(fileId=SHEET_ID, fields="modifiedTime").execute()
+    except Exception:
+        return None  # no disk cache then, just read the sheet
+    return meta.get("modifiedTime")
+
+def _disk_cache_name(modified: str) -> str:
+    return f"entries_{SHEET_ID}_{re.sub(r'[^0-9]', '', modified)}.feather"
+
+def _read_disk_cache(modified: str) -> Optional[pd.DataFrame]:
+    path = os.path.join(DISK_CACHE_DIR, _disk_cache_name(modified))
+    if not os.path.exists(path):
+        return None
+    try:
+        return pd.read_feather(path)
+    except Exception:
+        return None
+
+def _write_disk_cache(modified: str, df: pd.DataFrame):
+    """Keep one Feather snapshot per sheet, named after the sheet's modifiedTime."""
+    name = _disk_cache_name(modified)
+    try:
+        os.makedirs(DISK_CACHE_DIR, exist_ok=True)
+        df.to_feather(os.path.join(DISK_CACHE_DIR, name))
+        for old in os.listdir(DISK_CACHE_DIR):
+            if old.startswith(f"entries_{SHEET_ID}_") and old != name:
+                os.remove(os.path.join(DISK_CACHE_DIR, old))
+    except Exception:
+        # e.g. pyarrow missing or read-only disk; the cache is only an optimization
+        logger.warning("Could not write entries disk cache %s", name, exc_info=True)
+
+@st.cache_data(ttl=60, max_entries=4, show_spinner=False)
+def load_entries_df_cached():
+    if not SHEET_ID:
+        raise RuntimeError("SHEET_ID is blank. Add it to Streamlit secrets.")
+    started = time.time()
+    # Across restarts, an unchanged sheet (same Drive modifiedTime) loads from disk.
+    modified = _sheet_modified_time()
+    df = _read_disk_cache(modified) if modified else None
+    if df is None:
+        df = _fetch_entries_df(get_sheets_service())
+        if modified:
+            _write_disk_cache(modified, df)
+    df.attrs["loaded_at"] = started  # anything saved before this is already in df
     return df
 
+def _fetch_entries_df(svc) -> pd.DataFrame:
+    # Header + data in one round-trip; only fall back to the metadata call
+    # when the tab itself is missing (Sheets answers 400 "Unable to parse range").
+    try:
+        resp = _retry_sheets(
+            svc.spreadsheets().values().batchGet(
+                spreadsheetId=SHEET_ID,
+                ranges=[f"{WORKSHEET}!A1:I1", f"{WORKSHEET}!A2:I"],
+                majorDimension="ROWS",
+            ).execute
+        )
+    except HttpError as e:
+        if _http_status(e) != 400:
+            raise
+        ensure_worksheet_and_headers(svc)
+        return rows_to_df([])
+    header_range, data_range = resp.get("valueRanges", [{}, {}])
+    if header_range.get("values", [])[:1] != [HEADERS]:
+        _write_headers(svc)
+    return rows_to_df(data_range.get("values", []))
+
+def rows_to_df(rows: List[list]) -> pd.DataFrame:
+    """Sheet rows (lists of strings) -> entries DataFrame, built column-wise."""
+    width = len(HEADERS)
+    # Sheets drops trailing blank cells, so pad short rows before transposing.
+    padded = (r + [""] * (width - len(r)) if len(r) < width else r[:width] for r in rows)
+    cols = dict(zip(HEADERS, zip(*padded))) if rows else {h: np.empty(0, dtype=object) for h in HEADERS}
+    for name in CATEGORICAL_COLUMNS:
+        cols[name] = pd.Categorical(cols[name])
+    cols["amount"] = _parse_amounts(cols["amount"])
+    cols["date"] = pd.to_datetime(pd.Series(cols["date"], dtype=object), format="%Y-%m-%d", errors="coerce")
+    return pd.DataFrame(cols, columns=HEADERS)
+
+def _parse_amounts(values) -> np.ndarray:
+    # Amounts written by the app ("100.0") take the plain float cast; blanks and
+    # hand-formatted "$12" / "1,000" cells need the coercing parser.
+    try:
+        return np.nan_to_num(np.asarray(values, dtype=np.float64), nan=0.0)
+    except (TypeError, ValueError):
+        parsed = pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").fillna(0.0)
+        return parsed.to_numpy(dtype=np.float64)
+
+_ENTRY_KEY_COLUMNS = ["timestamp", "roommate", "month", "category"]
+
+def get_entries_df() -> pd.DataFrame:
+    """Cached entries plus this session's saves that the cached copy predates."""
+    df = load_entries_df_cached()
+    loaded_at = df.attrs.get("loaded_at", 0.0)
+    # Once a fresh load (TTL expiry or Refresh) covers a save, drop it from the delta.
+    delta = [(saved_at, rows) for saved_at, rows in st.session_state.get("delta_rows", []) if saved_at > loaded_at]
+    st.session_state["delta_rows"] = delta
+    if not delta:
+        return df
+    # Another session's reload may already hold these rows even though it started
+    # "before" our save, so skip any row the cached frame already has.
+    seen = set(zip(*(df[c].astype(str) for c in _ENTRY_KEY_COLUMNS)))
+    key_idx = [HEADERS.index(c) for c in _ENTRY_KEY_COLUMNS]
+    new_rows = [
+        row for _, rows in delta for row in rows if tuple(str(row[i]) for i in key_idx) not in seen
+    ]
+    if not new_rows:
+        return df
+    df = pd.concat([df, rows_to_df(new_rows)], ignore_index=True)
+    # concat falls back to object dtype when the category sets differ.
+    for name in CATEGORICAL_COLUMNS:
+        if not isinstance(df[name].dtype, pd.CategoricalDtype):
+            df[name] = df[name].astype("category")
+    return df
+
+def add_entries_to_session(rows: List[list], saved_at: float):
+    """Show just-saved rows without invalidating the cache and re-reading the sheet.
+
+    saved_at is when the append returned, i.e. when the rows became visible in the sheet.
+    """
+    st.session_state.setdefault("delta_rows", []).append((saved_at, rows))
+
+def filter_options(df: pd.DataFrame) -> Tuple[List[str], List[str]]:
+    """Sidebar roommate/month choices without a unique()+sort pass on every rerun."""
+    if df.empty:
+        return [], []
+    # Categories are already deduplicated and sorted.
+    roommates = [r for r in df["roommate"].cat.categories.tolist() if r]
+    return roommates, df["month"].cat.categories.tolist()
+
 # ==========================
 # ---- DRIVE UTILITIES  ----
 # ==========================
-def ensure_folder(drive: GoogleDrive, name: str, parent_id: str) -> str:
+@st.cache_resource(show_spinner=False)
+def _folder_cache() -> Tuple[Dict[Tuple[str, str], str], threading.Lock]:
+    """(parent_id, name) -> folder_id plus its lock.
+
+    Module globals are rebuilt on every rerun, so the cache lives in
+    st.cache_resource to be shared by every rerun and session in the process.
+    """
+    return {}, threading.Lock()
+
+@st.cache_resource(show_spinner=False)
+def _drive_auth_lock() -> threading.Lock:
+    """get_drive_client() shares one GoogleAuth across sessions and upload threads;
+    this process-wide lock serializes its token refresh and token.json write."""
+    return threading.Lock()
+
+def _thread_http(drive: GoogleDrive):
+    """Per-thread http object (httplib2 is not thread-safe).
+
+    Stored on PyDrive2's own auth.thread_local, like its LoadAuth path, so each
+    thread keeps one keep-alive connection instead of a new TLS handshake per call.
+    """
+    with _drive_auth_lock():
+        if drive.auth.access_token_expired:
+            drive.auth.Refresh()
+    local = drive.auth.thread_local
+    http = getattr(local, "http", None)
+    if http is None:
+        http = local.http = drive.auth.Get_Http_Object()
+    return http
+
+_FOLDER_QUERY_SUFFIX = " and mimeType = 'application/vnd.google-apps.folder' and trashed = false"
+
+def _escape_query_value(value: str) -> str:
+    # Drive query strings are single-quoted; a bare ' (e.g. "Gowith's") breaks the query.
+    return value.replace("\\", "\\\\").replace("'", "\\'")
+
+def _find_folder(drive: GoogleDrive, parent_id: str, name: str) -> List[dict]:
+    # v3 with a fields mask returns just the id instead of PyDrive2's full file resource.
     q = (
-        f"title = '{name}' and "
-        f"mimeType = 'application/vnd.google-apps.folder' and "
-        f"'{parent_id}' in parents and trashed = false"
+        f"name = '{_escape_query_value(name)}' and "
+        f"'{_escape_query_value(parent_id)}' in parents" + _FOLDER_QUERY_SUFFIX
     )
-    lst = drive.ListFile({"q": q}).GetList()
+    resp = get_drive_service().files().list(
+        q=q, fields="files(id)", pageSize=1, spaces="drive"
+    ).execute(http=_thread_http(drive))
+    return resp.get("files", [])
+
+def ensure_folder(drive: GoogleDrive, name: str, parent_id: str) -> str:
+    key = (parent_id, name)
+    folder_ids, lock = _folder_cache()
+    with lock:
+        cached = folder_ids.get(key)
+    if cached:
+        return cached
+    lst = _find_folder(drive, parent_id, name)
     if lst:
+        with lock:
+            folder_ids[key] = lst[0]["id"]
         return lst[0]["id"]
     folder = drive.CreateFile({
         "title": name,
@@ -226,34 +500,115 @@ def ensure_folder(drive: GoogleDrive, name: str, parent_id: str) -> str:
         "parents": [{"id": parent_id}],
     })
     folder.Upload()
+    with lock:
+        folder_ids[key] = folder["id"]
     return folder["id"]
 
-def upload_files_to_drive(
-    drive: GoogleDrive,
-    files: List[Tuple[str, bytes]],
-    *,
-    roommate: str,
-    month: str,
-    category: str,
-) -> List[str]:
-    if not DRIVE_FOLDER_ID or not files:
-        return []
-    month_id = ensure_folder(drive, month, DRIVE_FOLDER_ID)
-    rm_id = ensure_folder(drive, roommate, month_id)
-    cat_id = ensure_folder(drive, category, rm_id)
-
-    links = []
-    for filename, data in files:
-        f = drive.CreateFile({"title": filename, "parents": [{"id": cat_id}]})
-        f.content = io.BytesIO(data)
-        f.Upload()
-        # If you prefer fully private links, remove the permission below.
+def _upload_one(svc, drive: GoogleDrive, parent_id: str, filename: str, stream: IO[bytes]) -> dict:
+    stream.seek(0)
+    # Stream straight from the upload buffer, no bytes copy.
+    # An explicit type lets Drive index the file and open it in the right viewer.
+    # Prefer the browser-reported type of the UploadedFile, then the extension.
+    mime = getattr(stream, "type", None) or mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    media = MediaIoBaseUpload(stream, mimetype=mime, resumable=False)
+    return svc.files().create(
+        body={"name": filename, "parents": [parent_id], "mimeType": mime},
+        media_body=media,
+        fields="id,webViewLink",
+    ).execute(http=_thread_http(drive))
+
+def _share_anyone_reader(drive: GoogleDrive, file_ids: List[str]):
+    """One batched request for all the permission inserts instead of one RTT per file."""
+    if not file_ids:
+        return
+    svc = get_drive_service()
+    batch = svc.new_batch_http_request()
+    for file_id in file_ids:
+        batch.add(svc.permissions().create(
+            fileId=file_id, body={"type": "anyone", "role": "reader"}, fields="id"
+        ))
+    batch.execute(http=_thread_http(drive))
+
+def upload_pending_to_drive(
+    drive: GoogleDrive, items: List[dict]
+) -> Tuple[List[List[str]], Optional[Exception]]:
+    """Upload every item's files in one thread pool; returns links per item + first error."""
+    links: List[List[str]] = [[] for _ in items]
+    if not DRIVE_FOLDER_ID:
+        return links, None
+    error = None
+    jobs = []  # (item index, folder id, UploadedFile, sha256 digest)
+    for idx, item in enumerate(items):
+        if not item.get("uploads"):
+            continue
         try:
-            f.InsertPermission({"type": "anyone", "role": "reader", "value": "anyone"})
-        except Exception:
-            pass
-        links.append(f.get("alternateLink"))
-    return links
+            month_id = ensure_folder(drive, item["month"], DRIVE_FOLDER_ID)
+            rm_id = ensure_folder(drive, item["roommate"], month_id)
+            cat_id = ensure_folder(drive, item["category"], rm_id)
+        except Exception as e:
+            error = error or e
+            continue
+        # getvalue() hands back the buffer without the extra copy read() makes.
+        jobs.extend(
+            (idx, cat_id, uf, hashlib.sha256(uf.getvalue()).hexdigest()) for uf in item["uploads"]
+        )
+    if not jobs:
+        return links, error
+
+    # Receipts already in Drive (or attached twice in this submit) are uploaded once.
+    index = load_upload_index()
+    to_upload = {}
+    for _, cat_id, uf, digest in jobs:
+        if digest not in index:
+            to_upload.setdefault(digest, (cat_id, uf))
+
+    new_links: Dict[str, str] = {}
+    created = []
+    if to_upload:
+        # Files are independent (across categories too), so upload them all concurrently.
+        svc = get_drive_service()  # resolve on the script thread, not in the workers
+        with ThreadPoolExecutor(max_workers=min(DRIVE_UPLOAD_WORKERS, len(to_upload))) as ex:
+            futures = {
+                digest: ex.submit(_upload_one, svc, drive, cat_id, uf.name, uf)
+                for digest, (cat_id, uf) in to_upload.items()
+            }
+            for digest, fut in futures.items():
+                try:
+                    f = fut.result()
+                except Exception as e:
+                    error = error or e  # keep the other uploads and the sheet write going
+                    continue
+                created.append(f["id"])
+                new_links[digest] = f.get("webViewLink")
+
+    for idx, _, _, digest in jobs:
+        link = index.get(digest) or new_links.get(digest)
+        if link:
+            links[idx].append(link)
+
+    # If you prefer fully private links, remove the permission below.
+    try:
+        _share_anyone_reader(drive, created)
+    except Exception:
+        pass
+    try:
+        record_uploads(get_sheets_service(), new_links)
+    except Exception as e:
+        error = error or e
+    return links, error
+
+# ==========================
+# ---- CALENDAR HELPERS ----
+# ==========================
+def reminder_event_body(rm: str, start_dt: datetime, end_dt: datetime) -> dict:
+    return {
+        "summary": f"Rent & Utilities — {rm}",
+        "description": "Monthly reminder to update dashboard: Rent / Utilities / PG&E",
+        "start": {"dateTime": start_dt.isoformat(), "timeZone": CALENDAR_TIMEZONE},
+        "end": {"dateTime": end_dt.isoformat(), "timeZone": CALENDAR_TIMEZONE},
+        "recurrence": ["RRULE:FREQ=MONTHLY;BYMONTHDAY=1"],
+        "extendedProperties": {"private": {"roommate": rm}},
+    }
 
 # =====================
 # -------- UI ---------
@@ -291,134 +646,172 @@ with st.sidebar:
                 )
             )
             end_dt = start_dt + timedelta(hours=1)
-            created = 0
-            for rm in ROOMMATES:
-                summary = f"Rent & Utilities — {rm}"
-                body = {
-                    "summary": summary,
-                    "description": "Monthly reminder to update dashboard: Rent / Utilities / PG&E",
-                    "start": {"dateTime": start_dt.isoformat(), "timeZone": CALENDAR_TIMEZONE},
-                    "end": {"dateTime": end_dt.isoformat(), "timeZone": CALENDAR_TIMEZONE},
-                    "recurrence": ["RRULE:FREQ=MONTHLY;BYMONTHDAY=1"],
-                }
-                existing = cal.events().list(calendarId=CALENDAR_ID, q=summary, singleEvents=True, maxResults=1).execute()
-                if existing.get("items"):
-                    ev_id = existing["items"][0]["id"]
-                    cal.events().update(calendarId=CALENDAR_ID, eventId=ev_id, body=body).execute()
+            # One list call to find existing reminders, then every upsert in one batch request.
+            existing = cal.events().list(calendarId=CALENDAR_ID, q="Rent & Utilities", maxResults=250).execute()
+            ev_ids = {}
+            for ev in existing.get("items", []):
+                tagged = ev.get("extendedProperties", {}).get("private", {}).get("roommate")
+                if tagged:
+                    ev_ids[tagged] = ev["id"]
+                else:  # reminders created before events were tagged
+                    ev_ids.setdefault(ev.get("summary", "").replace("Rent & Utilities — ", "", 1), ev["id"])
+
+            errors = []
+            batch = cal.new_batch_http_request(
+                callback=lambda _rid, _resp, exc: errors.append(exc) if exc is not None else None
+            )
+            bodies = {rm: reminder_event_body(rm, start_dt, end_dt) for rm in ROOMMATES}
+            for rm, body in bodies.items():
+                if rm in ev_ids:
+                    batch.add(cal.events().update(calendarId=CALENDAR_ID, eventId=ev_ids[rm], body=body))
                 else:
-                    cal.events().insert(calendarId=CALENDAR_ID, body=body).execute()
-                created += 1
-            st.success(f"Calendar reminders ensured for {created} roommate(s).")
+                    batch.add(cal.events().insert(calendarId=CALENDAR_ID, body=body))
+            batch.execute()
+            if errors:
+                st.warning(f"Calendar issue: {errors[0]}")
+            st.success(f"Calendar reminders ensured for {len(ROOMMATES) - len(errors)} roommate(s).")
     else:
         st.info("Optional: set CALENDAR_ID to enable 1st-of-month reminders.")
 
     st.subheader("Filters")
+    if st.button("Refresh data"):
+        load_entries_df_cached.clear()
     try:
-        df_now = load_entries_df_cached()
+        df_now = get_entries_df()
     except Exception as e:
         st.error(f"Could not load data from Sheets. Check SHEET_ID + sharing. Error: {e}")
         df_now = pd.DataFrame(columns=HEADERS)
 
-    roommates_in_sheet = sorted([r for r in (df_now["roommate"].unique().tolist() if not df_now.empty else []) if r])
+    roommates_in_sheet, months_in_sheet = filter_options(df_now)
     selected_roommate = st.selectbox("Roommate", options=["All"] + roommates_in_sheet, index=0)
-    selected_month = st.selectbox("Month", options=["All"] + (sorted(df_now["month"].unique().tolist()) if not df_now.empty else []), index=0)
+    selected_month = st.selectbox("Month", options=["All"] + months_in_sheet, index=0)
     selected_status = st.selectbox("Status", ["All", "Paid", "Unpaid"], index=0)
 
 # Add Entries
+# One form for every roommate: a single "Save all" submit writes the whole batch.
+# The form is a fragment, so a submit that saves nothing doesn't rerun the page.
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", lambda fn: fn)
+
+def _render_rm_inputs(rm: str, month: str) -> List[dict]:
+    """One roommate's column of inputs; returns the entries ready to save."""
+    if not month:
+        # No category widgets until there is a month to file them under.
+        st.caption("Enter Month (YYYY-MM) to reveal categories.")
+        return []
+    notes = st.text_area("Notes (optional)", key=f"notes_{rm}")
+
+    pending = []
+    for cat in CATEGORIES:
+        st.markdown(f"**{cat}**")
+        paid = st.checkbox("Paid", key=f"paid_{rm}_{cat}")
+        status = "Paid" if paid else "Unpaid"
+        amount = st.number_input("Amount", min_value=0.0, step=1.0, key=f"amt_{rm}_{cat}")
+        bill_date = st.date_input("Date", value=date.today(), key=f"date_{rm}_{cat}")
+        uploads = st.file_uploader(
+            "Upload PDF/Screenshot (optional)",
+            type=["pdf", "png", "jpg", "jpeg"],
+            accept_multiple_files=True,
+            key=f"up_{rm}_{cat}",
+        )
+        st.divider()
+
+        pending.append({
+            "roommate": rm,
+            "month": month,
+            "category": cat,
+            "amount": amount,
+            "status": status,
+            "date": bill_date,
+            "notes": notes,
+            "uploads": uploads,
+        })
+    return pending
+
+def _save_pending(pending: List[dict]):
+    sheets = get_sheets_service()
+
+    ts = time.strftime("%Y-%m-%d %H:%M:%S")  # one timestamp for the whole submit
+    rows_to_append = []
+    for item in pending:
+        row = [
+            ts,
+            item["roommate"],
+            item["month"],
+            item["category"],
+            f"{item['amount']}",
+            item["status"],
+            item["date"].isoformat(),  # date -> "YYYY-MM-DD" without strftime
+            item["notes"],
+            "",  # file_links, filled in once the Drive uploads finish
+        ]
+        rows_to_append.append(row)
+
+    # Rows go in first so a slow or failing Drive upload never holds up the sheet write.
+    # One append call: the submit is either fully written or not at all.
+    try:
+        ensure_worksheet_and_headers(sheets)
+        append_resp = append_rows(sheets, rows_to_append)
+    except HttpError as e:
+        st.error(f"Sheets append error: {e}")
+        return
+    saved_at = time.time()  # rows are in the sheet now, before the Drive work below
+
+    drive_error = None
+    if DRIVE_FOLDER_ID and any(item.get("uploads") for item in pending):
+        try:
+            links_by_item, drive_error = upload_pending_to_drive(get_drive_client(), pending)
+            first_row = first_appended_row(append_resp)
+            links_by_row = {
+                first_row + i: "; ".join(links) for i, links in enumerate(links_by_item) if links
+            }
+            set_file_links(sheets, links_by_row)
+            for r, links in links_by_row.items():
+                rows_to_append[r - first_row][-1] = links
+        except Exception as e:
+            drive_error = e
+
+    add_entries_to_session(rows_to_append, saved_at)
+    saved_for = ", ".join(dict.fromkeys(item["roommate"] for item in pending))
+    flash = [("success", f"Saved {len(pending)} item(s) for {saved_for}.")]
+    if drive_error:
+        flash.append(("warning", f"Drive upload issue: {drive_error}"))
+    st.session_state["flash_entries"] = flash
+    st.rerun()  # full rerun so the sidebar filters and summary show the new rows
+
+@_fragment
+def _render_entries_form():
+    for level, msg in st.session_state.pop("flash_entries", []):
+        getattr(st, level)(msg)
+    # Month sits outside the form so typing it reruns the fragment and reveals the
+    # category inputs; everything else is buffered by the form until "Save all".
+    months = {}
+    for col, rm in zip(st.columns(len(ROOMMATES)), ROOMMATES):
+        with col:
+            st.markdown(f"### {rm}")
+            months[rm] = st.text_input("Month (YYYY-MM)", key=f"month_{rm}")
+    with st.form("form_all"):
+        pending = []
+        for col, rm in zip(st.columns(len(ROOMMATES)), ROOMMATES):
+            with col:
+                pending.extend(_render_rm_inputs(rm, months[rm]))
+        submitted = st.form_submit_button("Save all")
+
+    if not submitted:
+        return
+    if not SHEET_ID:
+        st.error("Please set SHEET_ID in Streamlit secrets.")
+    elif not pending:
+        st.warning("Nothing to save — enter Month and at least one category.")
+    else:
+        _save_pending(pending)
+
 st.subheader("Add entries — one column per roommate")
-columns = st.columns(len(ROOMMATES))
-sheets = None
-drive = None
-
-for col, rm in zip(columns, ROOMMATES):
-    with col:
-        st.markdown(f"### {rm}")
-        with st.form(f"form_{rm}"):
-            month = st.text_input("Month (YYYY-MM)", key=f"month_{rm}")
-            notes = st.text_area("Notes (optional)", key=f"notes_{rm}")
-
-            pending = []
-            for cat in CATEGORIES:
-                st.markdown(f"**{cat}**")
-                paid = st.checkbox("Paid", key=f"paid_{rm}_{cat}")
-                status = "Paid" if paid else "Unpaid"
-                amount = st.number_input("Amount", min_value=0.0, step=1.0, key=f"amt_{rm}_{cat}")
-                bill_date = st.date_input("Date", value=date.today(), key=f"date_{rm}_{cat}")
-                uploads = st.file_uploader(
-                    "Upload PDF/Screenshot (optional)",
-                    type=["pdf", "png", "jpg", "jpeg"],
-                    accept_multiple_files=True,
-                    key=f"up_{rm}_{cat}",
-                )
-                st.divider()
-
-                if month:
-                    pending.append({
-                        "roommate": rm,
-                        "month": month,
-                        "category": cat,
-                        "amount": amount,
-                        "status": status,
-                        "date": bill_date,
-                        "notes": notes,
-                        "uploads": uploads,
-                    })
-
-            submitted = st.form_submit_button("Save for " + rm)
-
-        if submitted:
-            if not SHEET_ID:
-                st.error("Please set SHEET_ID in Streamlit secrets.")
-            elif not pending:
-                st.warning("Nothing to save — enter Month and at least one category.")
-            else:
-                if sheets is None:
-                    sheets = get_sheets_service()
-                    ensure_worksheet_and_headers(sheets)
-
-                drive_error = None
-                for item in pending:
-                    links = []
-                    try:
-                        if DRIVE_FOLDER_ID and item.get("uploads"):
-                            if drive is None:
-                                drive = get_drive_client()
-                            files = [(uf.name, uf.read()) for uf in item["uploads"]]
-                            links = upload_files_to_drive(
-                                drive, files,
-                                roommate=item["roommate"],
-                                month=item["month"],
-                                category=item["category"],
-                            )
-                    except Exception as e:
-                        drive_error = e  # keep writing to sheet
-
-                    row = [
-                        time.strftime("%Y-%m-%d %H:%M:%S"),
-                        item["roommate"],
-                        item["month"],
-                        item["category"],
-                        f"{item['amount']}",
-                        item["status"],
-                        item["date"].strftime("%Y-%m-%d"),
-                        item["notes"],
-                        "; ".join(links) if links else "",
-                    ]
-                    try:
-                        append_row(sheets, row)
-                    except HttpError as e:
-                        st.error(f"Sheets append error: {e}")
-                        break
-
-                st.success(f"Saved {len(pending)} item(s) for {rm}.")
-                if drive_error:
-                    st.warning(f"Drive upload issue: {drive_error}")
-                st.cache_data.clear()
+_render_entries_form()
 
 # Summary
 st.subheader("Summary")
 try:
-    df = load_entries_df_cached()
+    df = get_entries_df()
 except Exception as e:
     st.error(f"Could not load data from Sheets. Check SHEET_ID and sharing. Error: {e}")
     df = pd.DataFrame(columns=HEADERS)
@@ -426,17 +819,23 @@ except Exception as e:
 if df.empty:
     st.info("No entries yet. Add your first one above.")
 else:
-    filtered = df.copy()
-    if selected_roommate != "All":
-        filtered = filtered[filtered["roommate"] == selected_roommate]
-    if selected_month != "All":
-        filtered = filtered[filtered["month"] == selected_month]
-    if selected_status != "All":
-        filtered = filtered[filtered["status"] == selected_status]
-
-    total_due = filtered.loc[filtered["status"] == "Unpaid", "amount"].sum()
-    total_paid = filtered.loc[filtered["status"] == "Paid", "amount"].sum()
-    total_all = filtered["amount"].sum()
+    # One combined mask -> one allocation; filtered is read-only so no copy,
+    # and with every filter on "All" the frame is used as-is.
+    mask = None
+    for column, selected in (
+        ("roommate", selected_roommate),
+        ("month", selected_month),
+        ("status", selected_status),
+    ):
+        if selected != "All":
+            hit = np.asarray(df[column].values == selected)
+            mask = hit if mask is None else mask & hit
+    filtered = df if mask is None else df.loc[mask]
+
+    sums = filtered.groupby("status", sort=False, observed=True)["amount"].sum()
+    total_paid = sums.get("Paid", 0.0)
+    total_due = sums.get("Unpaid", 0.0)
+    total_all = sums.sum()  # every row has a status group, so this covers all of them
     c1, c2, c3 = st.columns(3)
     c1.metric("Total Paid", f"${total_paid:,.2f}")
     c2.metric("Total Unpaid", f"${total_due:,.2f}")
@@ -444,4 +843,13 @@ else:
 
     st.divider()
     st.caption("Click column headers to sort. File links open the uploaded receipts in Drive.")
-    st.dataframe(filtered, use_container_width=True)
+    # date is datetime64 for sorting; show it as the plain date that was entered.
+    column_config = {"date": st.column_config.DateColumn(format="YYYY-MM-DD")}
+    # Only the newest rows and the everyday columns go to the browser unless asked.
+    if st.toggle("Show all rows and columns"):
+        st.dataframe(filtered, use_container_width=True, column_config=column_config)
+    else:
+        view = filtered.sort_values("date", ascending=False).head(SUMMARY_MAX_ROWS)
+        st.dataframe(view[SUMMARY_COLUMNS], use_container_width=True, column_config=column_config)
+        if len(filtered) > SUMMARY_MAX_ROWS:
+            st.caption(f"Showing the latest {SUMMARY_MAX_ROWS} of {len(filtered)} entries.")